@@ -1,6 +1,147 @@
+import ctypes
+import math
+import os
 import random
 from collections import Counter
 
+import numpy as np
+
+try:
+    from numba import njit, prange, get_num_threads
+except ImportError:
+    njit = None  # Optional: without numba the vectorized numpy path is used.
+    prange = range
+    get_num_threads = lambda: 1
+
+
+def _load_c_kernel():
+    """
+    Loads the optional compiled C kernel (simkernel.so, built from
+    simkernel.c in this directory) for hosts where a numba dependency is
+    undesirable. Returns None when the library hasn't been built.
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "simkernel.so")
+    if not os.path.exists(path):
+        return None
+    try:
+        lib = ctypes.CDLL(path)
+    except OSError:
+        return None
+    lib.run_simulations.argtypes = [
+        ctypes.POINTER(ctypes.c_uint8), ctypes.c_int64,
+        ctypes.POINTER(ctypes.c_int32), ctypes.POINTER(ctypes.c_int64),
+        ctypes.POINTER(ctypes.c_uint64), ctypes.POINTER(ctypes.c_uint8),
+        ctypes.c_int64, ctypes.c_int64, ctypes.c_int64, ctypes.c_int64,
+        ctypes.c_uint64, ctypes.POINTER(ctypes.c_uint64),
+    ]
+    lib.run_simulations.restype = None
+    return lib
+
+
+_c_kernel = _load_c_kernel()
+
+
+def _simulation_kernel(deck_buffers, count_buffers, combo_matrix, combo_anchors, combo_masks,
+                       combo_is_simple, num_cards_to_open, num_simulations):
+    """
+    Tight Monte Carlo loop compiled with numba when available.
+
+    Args:
+        deck_buffers (np.ndarray): (num_workers, deck_size) uint8 matrix; every
+                                   row is a copy of the population and serves as
+                                   one worker's reusable deck buffer.
+        count_buffers (np.ndarray): (num_workers, num_card_types) int32 zeroed
+                                    scratch, one row per worker.
+        combo_matrix (np.ndarray): (num_combos, num_card_types) int32 matrix of required counts.
+        combo_anchors (np.ndarray): int64 array; per combo, the id of its rarest
+                                    required card, checked first to prune most combos.
+        combo_masks (np.ndarray): uint64 array; per combo, a bitmask over card ids.
+        combo_is_simple (np.ndarray): bool array; True for combos needing at most
+                                      one copy of each card, which are tested as a
+                                      bitmask subset instead of a count comparison.
+        num_cards_to_open (int): Hand size drawn each simulation.
+        num_simulations (int): Number of simulated hands.
+
+    Returns:
+        np.ndarray: uint64 array of length num_simulations; bit c of entry s
+                    is set when simulation s met combination c.
+    """
+    num_combos, num_card_types = combo_matrix.shape
+    num_workers, deck_size = deck_buffers.shape
+    # The simulations are independent, so they run in parallel: each worker
+    # owns one buffer row and a contiguous slab of simulations, writing only
+    # its own slots of hit_bits (no shared accumulators to race on, and no
+    # thread-id lookup in the body, which would make the kernel uncacheable).
+    # A partially shuffled deck is still the same multiset of cards, so
+    # reusing the buffer keeps every partial Fisher-Yates draw uniform;
+    # numba keeps a per-thread RNG state.
+    hit_bits = np.zeros(num_simulations, dtype=np.uint64)
+    for w in prange(num_workers):
+        deck = deck_buffers[w]
+        hand_counts = count_buffers[w]
+        for s in range(w * num_simulations // num_workers,
+                       (w + 1) * num_simulations // num_workers):
+            # Partial Fisher-Yates: only the first num_cards_to_open positions
+            # need shuffling to draw a uniform hand. Counting and the hand
+            # bitmask are fused into the draw, so the hand is never re-read.
+            hand_mask = np.uint64(0)
+            for i in range(num_cards_to_open):
+                j = np.random.randint(i, deck_size)
+                deck[i], deck[j] = deck[j], deck[i]
+                hand_counts[deck[i]] += 1
+                hand_mask |= np.uint64(1) << np.uint64(deck[i])
+
+            bits = np.uint64(0)
+            for c in range(num_combos):
+                if combo_is_simple[c]:
+                    # No duplicates required: the whole combo check is one
+                    # branchless subset test on the hand bitmask.
+                    if (hand_mask & combo_masks[c]) == combo_masks[c]:
+                        bits |= np.uint64(1) << np.uint64(c)
+                    continue
+                # Cheap early exit: if the combo's rarest required card isn't
+                # there in sufficient numbers, skip the full comparison.
+                anchor = combo_anchors[c]
+                if hand_counts[anchor] < combo_matrix[c, anchor]:
+                    continue
+                met = True
+                for t in range(num_card_types):
+                    if hand_counts[t] < combo_matrix[c, t]:
+                        met = False
+                        break
+                if met:
+                    bits |= np.uint64(1) << np.uint64(c)
+            hit_bits[s] = bits
+
+            # Clear only the count slots this hand touched; cheaper than
+            # zeroing the whole vector when the hand is much smaller than
+            # the type count.
+            for i in range(num_cards_to_open):
+                hand_counts[deck[i]] = 0
+    return hit_bits
+
+
+if njit is not None:
+    _simulation_kernel = njit(cache=True, parallel=True)(_simulation_kernel)
+
+def _validate_card_definitions(card_definitions):
+    """
+    Validates a card_definitions dictionary, raising ValueError on bad input.
+    Called once up front so the hot paths can assume clean input.
+
+    Args:
+        card_definitions (dict): A dictionary where keys are card names (str)
+                                 and values are their respective counts (int) in the deck.
+    """
+    if not isinstance(card_definitions, dict) or not card_definitions:
+        raise ValueError("card_definitions must be a non-empty dictionary.")
+
+    for card_name, count in card_definitions.items():
+        if not isinstance(card_name, str) or not card_name:
+            raise ValueError(f"Card name must be a non-empty string. Found: {card_name}")
+        if not isinstance(count, int) or count <= 0:
+            raise ValueError(f"Card count for '{card_name}' must be a positive integer. Found: {count}")
+
 def create_deck(card_definitions):
     """
     Creates a deck of cards based on a dictionary of card names and their counts.
@@ -13,15 +154,10 @@ def create_deck(card_definitions):
     Returns:
         list: A shuffled list representing the deck of cards.
     """
-    if not isinstance(card_definitions, dict) or not card_definitions:
-        raise ValueError("card_definitions must be a non-empty dictionary.")
+    _validate_card_definitions(card_definitions)
 
     deck = []
     for card_name, count in card_definitions.items():
-        if not isinstance(card_name, str) or not card_name:
-            raise ValueError(f"Card name must be a non-empty string. Found: {card_name}")
-        if not isinstance(count, int) or count <= 0:
-            raise ValueError(f"Card count for '{card_name}' must be a positive integer. Found: {count}")
         deck.extend([card_name] * count)
     random.shuffle(deck)
     return deck
@@ -40,38 +176,74 @@ def open_cards(deck, num_cards_to_open):
     if num_cards_to_open < 0:
         raise ValueError("num_cards_to_open cannot be negative.")
 
-    opened_cards = []
-    for _ in range(num_cards_to_open):
-        if deck: # Ensure deck is not empty before popping
-            opened_cards.append(deck.pop(0)) # Pop from the beginning to simulate drawing
-        else:
-            # print("Deck is empty. No more cards to open.") # Suppress this print for cleaner simulation output
-            break
+    # Slice off the top of the deck in one go instead of popping card by card.
+    # deck.pop(0) shifts every remaining card on each draw (O(n) per card);
+    # a slice + del does the whole draw in a single pass. The deck is already
+    # shuffled, so drawing from the front this way is equivalent.
+    opened_cards = deck[:num_cards_to_open]
+    del deck[:num_cards_to_open]
     return opened_cards
 
-def check_for_combination(opened_cards, combination):
+def hypergeometric_at_least(copies, required, deck_size, num_cards_to_open):
+    """
+    Exact probability that a hand of num_cards_to_open cards drawn from a
+    deck_size-card deck contains at least `required` copies of a card that
+    has `copies` copies in the deck.
+
+    Args:
+        copies (int): Number of copies of the card in the deck.
+        required (int): Minimum number of copies needed in the hand.
+        deck_size (int): Total number of cards in the deck.
+        num_cards_to_open (int): Number of cards drawn.
+
+    Returns:
+        float: The hypergeometric tail probability P(X >= required).
+    """
+    total = math.comb(deck_size, num_cards_to_open)
+    miss = 0
+    for i in range(min(required, num_cards_to_open + 1)):
+        miss += math.comb(copies, i) * math.comb(deck_size - copies, num_cards_to_open - i)
+    return 1.0 - miss / total
+
+def prepare_combination(combination):
+    """
+    Preprocesses a combination into the required-count Counter used by
+    check_for_combination. The combinations never change during a run, so
+    build this once per combination instead of once per check.
+
+    Args:
+        combination (list): A list of card names that constitute the required combination.
+                            Example: ["Card A", "Card B", "Card A"]
+
+    Returns:
+        Counter: Card name -> required count.
+    """
+    return Counter(combination)
+
+def check_for_combination(opened_cards, combination_counts):
     """
     Checks if a specific combination of cards is present in the opened cards.
     This accounts for multiple instances of the same card in the combination.
 
     Args:
         opened_cards (list): A list of cards that were opened in a session.
-        combination (list): A list of card names that constitute the required combination.
-                            Example: ["Card A", "Card B", "Card A"]
+        combination_counts (Counter): Required counts per card name, as built
+                                      by prepare_combination.
 
     Returns:
         bool: True if the combination is met, False otherwise.
     """
-    if not combination:
+    if not combination_counts:
         return True # An empty combination is always "met"
 
-    opened_counts = Counter(opened_cards)
-    combination_counts = Counter(combination)
+    # Count the hand with a plain dict; for a 5-card hand this beats Counter,
+    # which is a dict subclass with extra __missing__ machinery per lookup.
+    opened_counts = {}
+    for card_name in opened_cards:
+        opened_counts[card_name] = opened_counts.get(card_name, 0) + 1
 
-    for card_name, required_count in combination_counts.items():
-        if opened_counts.get(card_name, 0) < required_count:
-            return False # Not enough of this card to meet the combination
-    return True
+    return all(opened_counts.get(card_name, 0) >= required_count
+               for card_name, required_count in combination_counts.items())
 
 def simulate_card_opening(card_definitions, num_cards_to_open, target_combinations_to_track, num_simulations):
     """
@@ -91,28 +263,166 @@ def simulate_card_opening(card_definitions, num_cards_to_open, target_combinatio
                                               times that combination was met (each combination counted independently).
               - 'hands_with_no_target_combination_met' (int): Count of hands where none of the target combinations were met.
     """
+    # Validate the inputs once here; the simulation paths assume clean input.
+    _validate_card_definitions(card_definitions)
+    if num_cards_to_open < 0:
+        raise ValueError("num_cards_to_open cannot be negative.")
+
     # Warn if any card in combinations isn't defined
     for combo in target_combinations_to_track:
         for card_in_combo in combo:
             if card_in_combo not in card_definitions:
                 print(f"Warning: Card '{card_in_combo}' in combination {combo} is not defined in card_definitions.")
 
-    combination_results = {tuple(sorted(combo)): 0 for combo in target_combinations_to_track} # Use sorted tuple as key
-    hands_with_no_target_combination_met = 0
+    # Encode cards as small integer ids so the hot loop works on numpy arrays
+    # instead of hashing strings into Counters. The population becomes one
+    # uint8 array built once; each combination becomes a fixed-size count
+    # vector so "is this combo in the hand" is a single vectorized >= check.
+    name_to_id = {name: i for i, name in enumerate(card_definitions)}
+    num_card_types = len(name_to_id)
+    if num_card_types > 256:
+        # Ids are stored as uint8 everywhere (population array, kernels);
+        # more types would silently wrap card 256 onto card 0.
+        raise ValueError(
+            f"At most 256 distinct card types are supported. Found: {num_card_types}")
+    counts = np.array(list(card_definitions.values()), dtype=np.int64)
+    population_ids = np.repeat(np.arange(num_card_types, dtype=np.uint8), counts)
+    num_cards_to_open = min(num_cards_to_open, len(population_ids))
+
+    # A combination referencing a card that isn't in the deck can never be met
+    # (matching the old Counter check), so only the others go into the kernel.
+    # Active combos are stacked into one required-count matrix.
+    # Sorted-tuple display keys are built once here and reused for both the
+    # active-combo tracking and the final results dict.
+    combo_keys = [tuple(sorted(combo)) for combo in target_combinations_to_track]
+    active_keys = []
+    active_vectors = []
+    for combo, combo_key in zip(target_combinations_to_track, combo_keys):
+        if all(card in name_to_id for card in combo):
+            active_keys.append(combo_key)
+            active_vectors.append(np.bincount(
+                [name_to_id[card] for card in combo],
+                minlength=num_card_types).astype(np.int32))
+    combo_matrix = (np.array(active_vectors, dtype=np.int32)
+                    if active_vectors else np.zeros((0, num_card_types), dtype=np.int32))
+
+    # Combinations built from a single card type have a closed-form
+    # hypergeometric answer, so report that exactly instead of a Monte Carlo
+    # estimate. The "no combination met" statistic is a joint event across
+    # all combos and still comes from the simulation.
+    deck_size = len(population_ids)
+    analytic_hits = []
+    for combo_vector in active_vectors:
+        required = np.nonzero(combo_vector)[0]
+        if required.size == 1:
+            card_id = int(required[0])
+            p = hypergeometric_at_least(
+                int(counts[card_id]), int(combo_vector[card_id]),
+                deck_size, num_cards_to_open)
+            analytic_hits.append(round(p * num_simulations))
+        else:
+            analytic_hits.append(None)
+
+    # Anchor each combo on its rarest required card (fewest copies in the
+    # deck): that's the card most likely to be missing, so checking it first
+    # prunes most combos at a single compare.
+    combo_anchors = np.zeros(combo_matrix.shape[0], dtype=np.int64)
+    for c in range(combo_matrix.shape[0]):
+        required = np.nonzero(combo_matrix[c])[0]
+        if required.size:
+            combo_anchors[c] = required[np.argmin(counts[required])]
+
+    # Most combos want at most one copy of each card, so hand membership is a
+    # set-subset question: encode those combos as bitmasks over card ids and
+    # test them against a hand bitmask with a single AND + compare. Combos
+    # demanding duplicates keep the count-vector path. Needs ids to fit in a
+    # uint64, which any realistic deck does.
+    combo_is_simple = np.zeros(combo_matrix.shape[0], dtype=np.bool_)
+    combo_masks = np.zeros(combo_matrix.shape[0], dtype=np.uint64)
+    if num_card_types <= 64:
+        for c in range(combo_matrix.shape[0]):
+            if combo_matrix[c].max(initial=0) <= 1:
+                combo_is_simple[c] = True
+                mask = 0
+                for card_id in np.nonzero(combo_matrix[c])[0]:
+                    mask |= 1 << int(card_id)
+                combo_masks[c] = mask
 
     print(f"\n--- Running {num_simulations} Simulations ---")
-    for i in range(num_simulations):
-        deck = create_deck(card_definitions)
-        opened_cards = open_cards(deck, num_cards_to_open)
-
-        current_hand_met_any_target_combination = False
-        for combo in target_combinations_to_track:
-            if check_for_combination(opened_cards, combo):
-                combination_results[tuple(sorted(combo))] += 1
-                current_hand_met_any_target_combination = True
-        
-        if not current_hand_met_any_target_combination:
-            hands_with_no_target_combination_met += 1
+
+    # The kernels (compiled C if simkernel.so is built, else numba) pack
+    # per-combo hits into uint64 bitmasks, so they handle at most 64 tracked
+    # combinations; past that, or with neither available, the vectorized
+    # numpy path takes over.
+    hit_bits = None
+    if combo_matrix.shape[0] <= 64:
+        if _c_kernel is not None and deck_size <= 256 and num_card_types <= 64:
+            hit_bits = np.zeros(num_simulations, dtype=np.uint64)
+            _c_kernel.run_simulations(
+                population_ids.ctypes.data_as(ctypes.POINTER(ctypes.c_uint8)),
+                deck_size,
+                combo_matrix.ctypes.data_as(ctypes.POINTER(ctypes.c_int32)),
+                combo_anchors.ctypes.data_as(ctypes.POINTER(ctypes.c_int64)),
+                combo_masks.ctypes.data_as(ctypes.POINTER(ctypes.c_uint64)),
+                combo_is_simple.ctypes.data_as(ctypes.POINTER(ctypes.c_uint8)),
+                combo_matrix.shape[0], num_card_types,
+                num_cards_to_open, num_simulations,
+                random.getrandbits(64),
+                hit_bits.ctypes.data_as(ctypes.POINTER(ctypes.c_uint64)))
+        elif njit is not None:
+            # Per-worker buffers are allocated here so the kernel itself never
+            # queries the thread count, keeping it cacheable across runs.
+            num_workers = max(1, min(get_num_threads(), num_simulations))
+            deck_buffers = np.tile(population_ids, (num_workers, 1))
+            count_buffers = np.zeros((num_workers, num_card_types), dtype=np.int32)
+            hit_bits = _simulation_kernel(
+                deck_buffers, count_buffers, combo_matrix, combo_anchors, combo_masks,
+                combo_is_simple, num_cards_to_open, num_simulations)
+
+    if hit_bits is not None:
+        combo_hits = np.zeros(combo_matrix.shape[0], dtype=np.int64)
+        for c in range(combo_matrix.shape[0]):
+            combo_hits[c] = int(((hit_bits >> np.uint64(c)) & np.uint64(1)).sum())
+        no_hits = int((hit_bits == 0).sum())
+    else:
+        # Vectorized fallback, streamed in fixed-size blocks: reducing each
+        # block to its hit counts right away keeps peak memory bounded by
+        # the block size instead of scaling every intermediate matrix with
+        # num_simulations.
+        rng = np.random.default_rng()
+        block_size = 16384
+        row_indices = np.arange(block_size)[:, None]
+        combo_hits = np.zeros(combo_matrix.shape[0], dtype=np.int64)
+        no_hits = 0
+        for start in range(0, num_simulations, block_size):
+            block = min(block_size, num_simulations - start)
+
+            # Give every deck position a random float32 key and argpartition
+            # the smallest num_cards_to_open keys per row: each row is a
+            # uniform k-subset, found in O(deck_size) without a full per-row
+            # Fisher-Yates.
+            keys = rng.random((block, deck_size), dtype=np.float32)
+            hand_indices = np.argpartition(
+                keys, min(num_cards_to_open, deck_size - 1), axis=1)[:, :num_cards_to_open]
+            hands = population_ids[hand_indices]
+
+            # Per-row bincount: (block, num_card_types) counts matrix.
+            hand_count_matrix = np.zeros((block, num_card_types), dtype=np.int32)
+            np.add.at(hand_count_matrix, (row_indices[:block], hands), 1)
+
+            # Evaluate every combination against every hand in one
+            # broadcasted comparison: (block, 1, types) >= (1, combos, types).
+            met_matrix = (hand_count_matrix[:, None, :] >= combo_matrix[None, :, :]).all(axis=2)
+            combo_hits += met_matrix.sum(axis=0)
+            no_hits += int((~met_matrix.any(axis=1)).sum())
+
+    # Combos are tracked purely by index during the run; the user-facing
+    # sorted-tuple dict is assembled once here at the reporting stage.
+    # Skipped combos stay at 0, and duplicate keys accumulate as before.
+    combination_results = {combo_key: 0 for combo_key in combo_keys} # Use sorted tuple as key
+    for combo_key, hits, analytic in zip(active_keys, combo_hits, analytic_hits):
+        combination_results[combo_key] += int(hits) if analytic is None else analytic
+    hands_with_no_target_combination_met = int(no_hits)
 
     return {
         'combination_results': combination_results,
@@ -0,0 +1,82 @@
+/*
+ * Optional C implementation of the Monte Carlo simulation kernel used by the
+ * deck scripts. Same semantics as the numba _simulation_kernel: per
+ * simulation, draw a hand with a partial Fisher-Yates, count card types on
+ * the fly, and pack per-combination hits into one uint64 bitmask.
+ *
+ * Build (the scripts pick up simkernel.so from this directory if present):
+ *
+ *     gcc -O3 -march=native -shared -fPIC -o simkernel.so simkernel.c
+ */
+#include <stdint.h>
+
+/* splitmix64: small, fast, and plenty for Monte Carlo sampling. */
+static inline uint64_t next_random(uint64_t *state)
+{
+    uint64_t z = (*state += 0x9e3779b97f4a7c15ULL);
+    z = (z ^ (z >> 30)) * 0xbf58476d1ce4e5b9ULL;
+    z = (z ^ (z >> 27)) * 0x94d049bb133111ebULL;
+    return z ^ (z >> 31);
+}
+
+/* Unbiased-enough bounded random via Lemire's multiply-shift. */
+static inline uint64_t random_below(uint64_t *state, uint64_t bound)
+{
+    return (uint64_t)(((__uint128_t)next_random(state) * bound) >> 64);
+}
+
+void run_simulations(const uint8_t *population_ids, int64_t deck_size,
+                     const int32_t *combo_matrix, const int64_t *combo_anchors,
+                     const uint64_t *combo_masks, const uint8_t *combo_is_simple,
+                     int64_t num_combos, int64_t num_card_types,
+                     int64_t num_cards_to_open, int64_t num_simulations,
+                     uint64_t seed, uint64_t *hit_bits)
+{
+    uint8_t deck[256];
+    int32_t hand_counts[64] = {0};
+    uint64_t rng = seed;
+
+    if (deck_size > 256 || num_card_types > 64 || num_combos > 64)
+        return; /* caller guards these; leave hit_bits zeroed if violated */
+
+    for (int64_t i = 0; i < deck_size; i++)
+        deck[i] = population_ids[i];
+
+    for (int64_t s = 0; s < num_simulations; s++) {
+        uint64_t hand_mask = 0;
+        for (int64_t i = 0; i < num_cards_to_open; i++) {
+            int64_t j = i + (int64_t)random_below(&rng, (uint64_t)(deck_size - i));
+            uint8_t tmp = deck[i];
+            deck[i] = deck[j];
+            deck[j] = tmp;
+            hand_counts[deck[i]]++;
+            hand_mask |= 1ULL << deck[i];
+        }
+
+        uint64_t bits = 0;
+        for (int64_t c = 0; c < num_combos; c++) {
+            if (combo_is_simple[c]) {
+                if ((hand_mask & combo_masks[c]) == combo_masks[c])
+                    bits |= 1ULL << c;
+                continue;
+            }
+            const int32_t *required = combo_matrix + c * num_card_types;
+            int64_t anchor = combo_anchors[c];
+            if (hand_counts[anchor] < required[anchor])
+                continue;
+            int met = 1;
+            for (int64_t t = 0; t < num_card_types; t++) {
+                if (hand_counts[t] < required[t]) {
+                    met = 0;
+                    break;
+                }
+            }
+            if (met)
+                bits |= 1ULL << c;
+        }
+        hit_bits[s] = bits;
+
+        for (int64_t i = 0; i < num_cards_to_open; i++)
+            hand_counts[deck[i]] = 0;
+    }
+}